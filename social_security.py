@@ -19,9 +19,21 @@
 #
 
 # Import modules
+import argparse
 from datetime import datetime
-from math import floor
-import xml.etree.ElementTree as et
+from heapq import nlargest
+from types import MappingProxyType
+
+# Prefer the libxml2 backed parser when it is available, it is considerably
+# faster than the pure Python ElementTree and shares the same API. Statements
+# may come from any path, so lxml is told not to expand entities or fetch
+# anything over the network (ElementTree never loads external entities).
+try:
+    from lxml import etree as et
+    XML_PARSE_OPTIONS = {'resolve_entities': False, 'no_network': True}
+except ImportError:
+    import xml.etree.ElementTree as et
+    XML_PARSE_OPTIONS = {}
 
 # Earnings history by year.
 # You can find out the information by logging into "my Social Security" at
@@ -53,16 +65,49 @@ EarningsRecord = {
     2017 :      0.0
 }
 
-try:
-    namespaces = {'osss': 'http://ssa.gov/osss/schemas/1.0'}
-    xtree = et.parse("Your_Social_Security_Statement_Data.xml")
-    xroot = xtree.getroot()
-    EarningsRecord.clear()
+# Default location of the statement data downloaded from "my Social Security"
+SOC_SEC_XML = "Your_Social_Security_Statement_Data.xml"
+
+# Namespace qualified tags of the statement elements that are read, resolved
+# once here instead of on every element
+OSSS_NS = 'http://ssa.gov/osss/schemas/1.0'
+EARNINGS_TAG = f'{{{OSSS_NS}}}Earnings'
+FICA_EARNINGS_TAG = f'{{{OSSS_NS}}}FicaEarnings'
+
+# Load the earnings history from a Social Security statement XML file into the
+# EarningsRecord dictionary. Stream the statement rather than building the
+# whole tree, each Earnings element is removed from its parent as soon as its
+# values have been read. EarningsRecord is only replaced once the whole file
+# has been read, a missing, malformed or empty statement leaves it untouched.
+# Returns True if the statement was loaded.
+def load_xml_statement(fspec=SOC_SEC_XML):
+    Statement = {}
+    # Stack of the currently open elements, the last one is the parent of the
+    # element that has just ended
+    Parents = []
+    try:
+        for event, node in et.iterparse(fspec, events=('start', 'end'), **XML_PARSE_OPTIONS):
+            if event == 'start':
+                Parents.append(node)
+                continue
+            Parents.pop()
+            if node.tag == EARNINGS_TAG:
+                Statement[int(node.get("startYear"))] = float( node.find(FICA_EARNINGS_TAG).text)
+                Parents[-1].remove(node)
+    except OSError:
+        print ("XML file was not found!")
+        return False
+    except (et.ParseError, AttributeError, TypeError, ValueError) as e:
+        print (f"XML file could not be parsed: {e}")
+        return False
+
+    if not Statement:
+        print ("XML file has no earnings!")
+        return False
 
-    for node in xroot.findall('osss:EarningsRecord/osss:Earnings', namespaces):
-        EarningsRecord[int(node.attrib.get("startYear"))] = float( node.find("osss:FicaEarnings", namespaces).text)
-except:
-    print ("XML file was not found!")
+    EarningsRecord.clear()
+    EarningsRecord.update(Statement)
+    return True
 
 # National Average Wage Index (NAWI) data as defined by:
 # https://www.ssa.gov/oact/cola/AWI.html
@@ -84,103 +129,131 @@ NationalAverageWageIndexSeries = {
     2016 : 48642.15,   2017 : 50321.89,   2018 : 52145.80,   2019 : 54099.99
 }
 
-# The first year with Social Security Earnings
-EarningsRecord_FirstYear = min(EarningsRecord, key=int)
-
-# The last year with Social Security Earnings
-EarningsRecord_LastYear = max(EarningsRecord, key=int)
-
 # The first year of NAWI data
-NationalAverageWageIndexSeries_FirstYear = min(NationalAverageWageIndexSeries, key=int)
+NationalAverageWageIndexSeries_FirstYear = min(NationalAverageWageIndexSeries)
 
 # The last year of NAWI data
-NationalAverageWageIndexSeries_LastYear = max(NationalAverageWageIndexSeries, key=int)
-
-# Dictionary to hold the Average Wage Index (AWI) adjustment by year
-AWI_Factors = {}
-
-# Keep track of the last year for which an AWI adjustment factor is calculated
-Last_AWI_Year = NationalAverageWageIndexSeries_FirstYear
-
-# Calculate the AWI adjustment factor for each year that we have data
-for i in range(NationalAverageWageIndexSeries_FirstYear, NationalAverageWageIndexSeries_LastYear) :
-    AWI_Factors[i] = 1 + ( (NationalAverageWageIndexSeries[NationalAverageWageIndexSeries_LastYear] - NationalAverageWageIndexSeries[i]) / NationalAverageWageIndexSeries[i])
-    Last_AWI_Year = i
-
-# If we don't have data for the most recent years, just pad out the adjustment
-# factor to be "1.0" up until the last year with earnings
-for i in range(Last_AWI_Year + 1, EarningsRecord_LastYear + 1) :
-    AWI_Factors[i] = 1.0
-
-# Dictionary to hold the amount of annual adjusted earnings (as adjusted by the
-# AWI factors in each year) per year
-AdjustedEarnings = {}
-
-# Calculate the amount of the adjusted earnings for each year by multiplying
-# the earnings in each year by the AWI adjustment factor for that specific year
-for i in range(EarningsRecord_FirstYear, EarningsRecord_LastYear + 1) :
-    AdjustedEarnings[i] = EarningsRecord[i] * AWI_Factors[i]
-
-# Auxiliary helper function that will return the key of a dictionary that
-# corresponds to the maximum value in the dictionary. This will be used when
-# calculating the top 35 years of earnings history.
-def KeyWithMaxVal(d):
-    v = list(d.values())
-    k = list(d.keys())
-    return k[v.index(max(v))]
-
-# Variable to hold the accumulation of the top 35 years of adjusted annual
-# earnings
-Top35YearsEarnings = 0.0;
-
-# Accumulate the top 35 years of adjusted earnings
-for i in range(0, 35):
-    if AdjustedEarnings:
-        top_year = KeyWithMaxVal(AdjustedEarnings)
-        Top35YearsEarnings += AdjustedEarnings[top_year]
-        del AdjustedEarnings[top_year]
-
-# Calculate the Average Indexed Monthly earnings (AIME) by dividing the Top 35
-# years of earnings by the number of months in 35 years (35 * 12 = 420)
-AIME = Top35YearsEarnings / 420.0
+NationalAverageWageIndexSeries_LastYear = max(NationalAverageWageIndexSeries)
+
+# The NAWI of the last year of data, every other year is indexed to this one
+LastYearNAWI = NationalAverageWageIndexSeries[NationalAverageWageIndexSeries_LastYear]
+
+# Dictionary to hold the Average Wage Index (AWI) adjustment factor for each
+# year that we have data, 1 + (LastYearNAWI - NAWI) / NAWI simplifies to
+# LastYearNAWI / NAWI. The NAWI data is constant so this is only done once,
+# and the table is read-only.
+AWI_Factors = MappingProxyType({i : LastYearNAWI / v for i, v in NationalAverageWageIndexSeries.items()})
 
 # Calculate the Social Security "Bend Points" for the Primary Insurance Amount
 # (PIA) as defined by:
 # https://www.ssa.gov/oact/cola/piaformula.html
 #
-FirstBendPoint = round(180.0 * NationalAverageWageIndexSeries[NationalAverageWageIndexSeries_LastYear] / 9779.44)
-SecondBendPoint = round(1085.0 * NationalAverageWageIndexSeries[NationalAverageWageIndexSeries_LastYear] / 9779.44)
-
-# Variable to hold the normal monthly benefit amount
-NormalMonthlyBenefit = 0.0;
-
-# If the calculated AIME is below the first bend point
-if AIME <= FirstBendPoint:
-    NormalMonthlyBenefit = 0.9 * AIME
-# Otherwise, if the AIME is between the two bend points
-elif AIME > FirstBendPoint and AIME <= SecondBendPoint:
-    NormalMonthlyBenefit = (0.9 * FirstBendPoint) + ( 0.32 * (AIME - FirstBendPoint) )
-# Otherwise if the AIME is beyond the second bend point
-else:
-    NormalMonthlyBenefit = (0.9 * FirstBendPoint) + ( 0.32 * (SecondBendPoint - FirstBendPoint) ) + ( 0.15 * (AIME - SecondBendPoint) )
-
-# The monthly benefit amount is rounded down to the nearest 0.10
-NormalMonthlyBenefit = (floor(NormalMonthlyBenefit * 10.0)) / 10.0
-
-# Calculate the reduced monthly benefit. Note that this takes into account the
-# worst case scenario (70%). Depending on your birth date and how early you
-# begin drawing Social Security, this number may be different.
-ReducedMonthlyBenefit = 0.7 * NormalMonthlyBenefit
-ReducedMonthlyBenefit = (floor(ReducedMonthlyBenefit * 10.0)) / 10.0
+# These only depend on the NAWI data so they are calculated once here
+FirstBendPoint = round(180.0 * LastYearNAWI / 9779.44)
+SecondBendPoint = round(1085.0 * LastYearNAWI / 9779.44)
 
-# Print the results
-print ("Top 35 Years of Adjusted Earnings _________" + "{:11.2f}".format(Top35YearsEarnings))
-print ("Average Indexed Monthly Earnings (AIME) ___" + "{:11.2f}".format(AIME))
-print ("First Bend Point __________________________" + "{:11.2f}".format(FirstBendPoint))
-print ("Second Bend Point _________________________" + "{:11.2f}".format(SecondBendPoint))
-print ("Normal Monthly Benefit ____________________" + "{:11.2f}".format(NormalMonthlyBenefit))
-print ("Normal Annual Benefit _____________________" + "{:11.2f}".format(NormalMonthlyBenefit * 12.0))
-print ("Reduced (70%) Monthly Benefit _____________" + "{:11.2f}".format(ReducedMonthlyBenefit))
-print ("Reduced (70%) Annual Benefit ______________" + "{:11.2f}".format(ReducedMonthlyBenefit * 12.0))
+# Calculate the Primary Insurance Amount (PIA) for a single AIME. The PIA is
+# a piecewise-linear function of the AIME with a slope of 90% up to the first
+# bend point, 32% up to the second bend point and 15% beyond it. The bend
+# points default to the ones calculated above. Kept as a pure function so
+# what-if AIME values can be tried one call at a time.
+def PrimaryInsuranceAmount(AIME, Bend1=FirstBendPoint, Bend2=SecondBendPoint):
+    # Sum each segment of the formula that the AIME reaches, segments beyond
+    # the AIME contribute nothing, so no branching on the AIME is needed
+    return ( 0.9 * min(AIME, Bend1) ) + ( 0.32 * max(0.0, min(AIME, Bend2) - Bend1) ) + ( 0.15 * max(0.0, AIME - Bend2) )
+
+# Round a non-negative benefit amount down to the nearest 0.10, int() truncates
+# toward zero which is the same as floor() for the non-negative amounts here
+def RoundDownToDime(x):
+    return int(x * 10.0) / 10.0
 
+# Run the whole calculation on an earnings record, by default the current
+# EarningsRecord, and return the results in a dictionary. What-if scenarios can
+# pass their own {year: earnings} dictionaries without reloading the statement.
+def compute(earnings=None):
+    if earnings is None:
+        earnings = EarningsRecord
 
+    # The first year with Social Security Earnings
+    EarningsRecord_FirstYear = min(earnings)
+
+    # The last year with Social Security Earnings
+    EarningsRecord_LastYear = max(earnings)
+
+    # The annual adjusted earnings (as adjusted by the AWI factors in each year)
+    # are the earnings in each year multiplied by the AWI adjustment factor for
+    # that specific year. If we don't have data for the most recent years, the
+    # adjustment factor for them is just "1.0". They are generated straight
+    # into the bounded heap of nlargest rather than being stored.
+    AdjustedEarnings = (earnings[i] * (AWI_Factors[i] if i <= NationalAverageWageIndexSeries_LastYear else 1.0)
+                        for i in range(EarningsRecord_FirstYear, EarningsRecord_LastYear + 1))
+
+    # Accumulate the top 35 years of adjusted earnings
+    Top35YearsEarnings = sum(nlargest(35, AdjustedEarnings))
+
+    # Calculate the Average Indexed Monthly earnings (AIME) by dividing the Top 35
+    # years of earnings by the number of months in 35 years (35 * 12 = 420)
+    AIME = Top35YearsEarnings / 420.0
+
+    # The normal monthly benefit amount is the PIA
+    NormalMonthlyBenefit = PrimaryInsuranceAmount(AIME)
+
+    # The monthly benefit amount is rounded down to the nearest 0.10
+    NormalMonthlyBenefit = RoundDownToDime(NormalMonthlyBenefit)
+
+    # Calculate the reduced monthly benefit. Note that this takes into account the
+    # worst case scenario (70%). Depending on your birth date and how early you
+    # begin drawing Social Security, this number may be different.
+    ReducedMonthlyBenefit = RoundDownToDime(0.7 * NormalMonthlyBenefit)
+
+    return {
+        'Top35YearsEarnings': Top35YearsEarnings,
+        'AIME': AIME,
+        'FirstBendPoint': FirstBendPoint,
+        'SecondBendPoint': SecondBendPoint,
+        'NormalMonthlyBenefit': NormalMonthlyBenefit,
+        'ReducedMonthlyBenefit': ReducedMonthlyBenefit,
+    }
+
+# The results for the default SOC_SEC_XML statement are only calculated, and
+# the statement only loaded, on the first call to get_results() so that
+# importing this module is cheap. Later calls return the same cached results,
+# read-only so callers cannot alter them. For any other statement call
+# load_xml_statement(fspec) and then compute() directly.
+Results = None
+
+def get_results():
+    global Results
+    if Results is None:
+        load_xml_statement()
+        Results = MappingProxyType(compute())
+    return Results
+
+# Format the results as printable text
+def format_results(results):
+    lines = []
+    lines.append(f"Top 35 Years of Adjusted Earnings _________{results['Top35YearsEarnings']:11.2f}")
+    lines.append(f"Average Indexed Monthly Earnings (AIME) ___{results['AIME']:11.2f}")
+    lines.append(f"First Bend Point __________________________{results['FirstBendPoint']:11.2f}")
+    lines.append(f"Second Bend Point _________________________{results['SecondBendPoint']:11.2f}")
+    lines.append(f"Normal Monthly Benefit ____________________{results['NormalMonthlyBenefit']:11.2f}")
+    lines.append(f"Normal Annual Benefit _____________________{results['NormalMonthlyBenefit'] * 12.0:11.2f}")
+    lines.append(f"Reduced (70%) Monthly Benefit _____________{results['ReducedMonthlyBenefit']:11.2f}")
+    lines.append(f"Reduced (70%) Annual Benefit ______________{results['ReducedMonthlyBenefit'] * 12.0:11.2f}")
+    return '\n'.join(lines)
+
+# Print the results
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Calculate estimated Social Security benefits")
+    parser.add_argument('xml', nargs='?',
+                        help=f"Social Security statement data XML (default: {SOC_SEC_XML})")
+    args = parser.parse_args()
+    if args.xml is None:
+        results = get_results()
+    else:
+        # Don't fall back to the sample EarningsRecord for a statement that
+        # was asked for by name
+        if not load_xml_statement(args.xml):
+            parser.error(f"could not load statement {args.xml}")
+        results = compute()
+    print (format_results(results))
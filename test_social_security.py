@@ -0,0 +1,140 @@
+#
+# Checks of the Social Security calculation against known values.
+#
+# Run with:  python -m unittest test_social_security
+#
+
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+import social_security as ss
+
+
+# The PIA formula as the original if/elif/else chain, used to check that the
+# branchless PrimaryInsuranceAmount() gives identical results
+def BranchedPrimaryInsuranceAmount(AIME, Bend1, Bend2):
+    if AIME <= Bend1:
+        return 0.9 * AIME
+    elif AIME <= Bend2:
+        return (0.9 * Bend1) + ( 0.32 * (AIME - Bend1) )
+    else:
+        return (0.9 * Bend1) + ( 0.32 * (Bend2 - Bend1) ) + ( 0.15 * (AIME - Bend2) )
+
+
+def StatementXML(earnings):
+    lines = ['<?xml version="1.0"?>',
+             f'<osss:OnlineSocialSecurityStatementData xmlns:osss="{ss.OSSS_NS}">',
+             '<osss:EarningsRecord>']
+    for year, amount in earnings.items():
+        lines.append(f'<osss:Earnings startYear="{year}" endYear="{year}">'
+                     f'<osss:FicaEarnings>{amount}</osss:FicaEarnings>'
+                     f'<osss:MedicareEarnings>{amount}</osss:MedicareEarnings>'
+                     '</osss:Earnings>')
+    lines += ['</osss:EarningsRecord>', '</osss:OnlineSocialSecurityStatementData>']
+    return '\n'.join(lines)
+
+
+class PrimaryInsuranceAmountTest(unittest.TestCase):
+    def test_bend_points(self):
+        self.assertEqual(ss.FirstBendPoint, 996)
+        self.assertEqual(ss.SecondBendPoint, 6002)
+
+    def test_known_values(self):
+        self.assertEqual(ss.PrimaryInsuranceAmount(0.0), 0.0)
+        self.assertAlmostEqual(ss.PrimaryInsuranceAmount(996.0), 896.4)
+        self.assertAlmostEqual(ss.PrimaryInsuranceAmount(6002.0), 2498.32)
+        self.assertAlmostEqual(ss.PrimaryInsuranceAmount(10000.0), 3098.02)
+
+    def test_matches_branched_formula(self):
+        Bend1, Bend2 = ss.FirstBendPoint, ss.SecondBendPoint
+        for AIME in [x * 0.37 for x in range(0, 40000)] + [Bend1, Bend2]:
+            self.assertEqual(ss.PrimaryInsuranceAmount(AIME),
+                             BranchedPrimaryInsuranceAmount(AIME, Bend1, Bend2), AIME)
+
+    def test_explicit_bend_points(self):
+        self.assertAlmostEqual(ss.PrimaryInsuranceAmount(2000.0, 1000, 5000), 1220.0)
+
+
+class ComputeTest(unittest.TestCase):
+    # 35 years at the last NAWI, all of them unindexed (factor 1.0)
+    Earnings = dict.fromkeys(range(2019, 2054), 54099.99)
+
+    def setUp(self):
+        self.saved = ss.EarningsRecord
+
+    def tearDown(self):
+        ss.EarningsRecord = self.saved
+
+    def test_known_results(self):
+        results = ss.compute(self.Earnings)
+        self.assertAlmostEqual(results['Top35YearsEarnings'], 35 * 54099.99, places=6)
+        self.assertAlmostEqual(results['AIME'], 4508.3325, places=6)
+        self.assertEqual(results['NormalMonthlyBenefit'], 2020.3)
+        self.assertEqual(results['ReducedMonthlyBenefit'], 1414.2)
+
+    def test_only_top_35_years_count(self):
+        earnings = dict(self.Earnings)
+        earnings.update(dict.fromkeys(range(2000, 2019), 0.0))
+        self.assertEqual(ss.compute(earnings), ss.compute(self.Earnings))
+
+    def test_default_is_current_earnings_record(self):
+        ss.EarningsRecord = self.Earnings
+        self.assertEqual(ss.compute(), ss.compute(self.Earnings))
+
+    def test_awi_factors_are_not_padded(self):
+        count = len(ss.AWI_Factors)
+        ss.compute(self.Earnings)
+        self.assertEqual(len(ss.AWI_Factors), count)
+
+
+class LoadXmlStatementTest(unittest.TestCase):
+    Earnings = {2001: 1000.0, 2002: 2000.5, 2003: 0.0}
+
+    def setUp(self):
+        self.saved = dict(ss.EarningsRecord)
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        ss.EarningsRecord.clear()
+        ss.EarningsRecord.update(self.saved)
+        self.tmpdir.cleanup()
+
+    def load(self, text):
+        fspec = os.path.join(self.tmpdir.name, 'statement.xml')
+        with open(fspec, 'w') as f:
+            f.write(text)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return ss.load_xml_statement(fspec)
+
+    def test_load(self):
+        self.assertTrue(self.load(StatementXML(self.Earnings)))
+        self.assertEqual(ss.EarningsRecord, self.Earnings)
+
+    def test_truncated_statement_keeps_record(self):
+        text = StatementXML(self.Earnings)
+        self.assertFalse(self.load(text[:text.index('2002')]))
+        self.assertEqual(ss.EarningsRecord, self.saved)
+
+    def test_statement_without_earnings_keeps_record(self):
+        self.assertFalse(self.load(StatementXML({})))
+        self.assertEqual(ss.EarningsRecord, self.saved)
+
+    def test_missing_statement_keeps_record(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertFalse(ss.load_xml_statement(os.path.join(self.tmpdir.name, 'nosuch.xml')))
+        self.assertEqual(ss.EarningsRecord, self.saved)
+
+
+class FormatResultsTest(unittest.TestCase):
+    def test_layout(self):
+        lines = ss.format_results(ss.compute(ComputeTest.Earnings)).split('\n')
+        self.assertEqual(len(lines), 8)
+        self.assertEqual(lines[1], "Average Indexed Monthly Earnings (AIME) ___    4508.33")
+        self.assertEqual(lines[4], "Normal Monthly Benefit ____________________    2020.30")
+
+
+if __name__ == '__main__':
+    unittest.main()